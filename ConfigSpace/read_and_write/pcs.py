@@ -10,9 +10,8 @@ A detailed explanation of the **old** PCS format can be found
 __authors__ = ["Katharina Eggensperger", "Matthias Feurer"]
 __contact__ = "automl.org"
 
-from collections import OrderedDict
 from itertools import product
-from io import StringIO
+import re
 import sys
 
 import pyparsing
@@ -58,10 +57,12 @@ pp_float = pyparsing.Combine(
 pp_eorE = pyparsing.Literal('e') | pyparsing.Literal('E')
 pp_floatorint = pp_float | pp_int
 pp_e_notation = pyparsing.Combine(pp_floatorint + pp_eorE + pp_int)
-pp_number = pp_e_notation | pp_float | pp_int
+# Matches the same numbers as ``pp_e_notation | pp_float | pp_int``, but as a single
+# regular expression instead of a nested alternation of pyparsing expressions
+pp_number = pyparsing.Regex(r"[+-]?(?:\d*\.\d+|\d+)(?:[eE][+-]?\d+)?")
 pp_numberorname = pp_number | pp_param_name
 pp_il = pyparsing.Word("il")
-pp_choices = pp_param_name + pyparsing.Optional(pyparsing.OneOrMore("," + pp_param_name))
+pp_choices = pp_param_name + pyparsing.ZeroOrMore(pyparsing.Suppress(",") + pp_param_name)
 
 pp_cont_param = pp_param_name + "[" + pp_number + "," + pp_number + "]" + \
     "[" + pp_number + "]" + pyparsing.Optional(pp_il)
@@ -70,20 +71,27 @@ pp_condition = pp_param_name + "|" + pp_param_name + "in" + "{" + pp_choices + "
 pp_forbidden_clause = "{" + pp_param_name + "=" + pp_numberorname + \
     pyparsing.Optional(pyparsing.OneOrMore("," + pp_param_name + "=" + pp_numberorname)) + "}"
 
+# Regular expression equivalent of pp_param_name, used to validate names in write()
+_NAME = r"[A-Za-z0-9_\-@.:;\\/?!$%&*+<>]+"
+_NAME_RE = re.compile(_NAME)
+# Conditions always have the form ``child | parent in {value, value, ...}``, which is a
+# regular language and is therefore matched by a single regular expression instead of
+# ``pp_condition``
+_COND_RE = re.compile(
+    r"(%s)\s*\|\s*(%s)\s+in\s*\{\s*(%s(?:\s*,\s*%s)*)\s*\}" % (_NAME, _NAME, _NAME, _NAME)
+)
+
 
 def build_categorical(param):
     if param.weights is not None:
         raise ValueError('The pcs format does not support categorical hyperparameters with '
                          'assigned weights (for hyperparameter %s)' % param.name)
-    cat_template = "%s {%s} [%s]"
-    return cat_template % (param.name,
-                           ", ".join([str(value) for value in param.choices]),
-                           str(param.default_value))
+    choices = ", ".join(map(str, param.choices))
+    return f"{param.name} {{{choices}}} [{param.default_value}]"
 
 
 def build_constant(param):
-    constant_template = "%s {%s} [%s]"
-    return constant_template % (param.name, param.value, param.value)
+    return f"{param.name} {{{param.value}}} [{param.value}]"
 
 
 def build_continuous(param):
@@ -91,25 +99,19 @@ def build_continuous(param):
                        NormalFloatHyperparameter):
         param = param.to_uniform()
 
-    float_template = "%s%s [%s, %s] [%s]"
-    int_template = "%s%s [%d, %d] [%d]i"
-    if param.log:
-        float_template += "l"
-        int_template += "l"
+    log_suffix = "l" if param.log else ""
 
     if param.q is not None:
-        q_prefix = "Q%d_" % (int(param.q),)
+        q_prefix = f"Q{int(param.q)}_"
     else:
         q_prefix = ""
-    default_value = param.default_value
 
     if isinstance(param, IntegerHyperparameter):
-        default_value = int(default_value)
-        return int_template % (q_prefix, param.name, param.lower,
-                               param.upper, default_value)
+        return (f"{q_prefix}{param.name} [{param.lower:d}, {param.upper:d}] "
+                f"[{int(param.default_value):d}]i{log_suffix}")
     else:
-        return float_template % (q_prefix, param.name, str(param.lower),
-                                 str(param.upper), str(default_value))
+        return (f"{q_prefix}{param.name} [{param.lower}, {param.upper}] "
+                f"[{param.default_value}]{log_suffix}")
 
 
 def build_condition(condition):
@@ -152,20 +154,13 @@ def build_forbidden(clause):
 
     if not isinstance(clause, (ForbiddenEqualsClause, ForbiddenAndConjunction)):
         raise NotImplementedError("SMAC cannot handle '%s' of type %s" %
-                                  str(clause), (type(clause)))
+                                  (str(clause), type(clause)))
 
-    retval = StringIO()
-    retval.write("{")
     # Really simple because everything is an AND-conjunction of equals
     # conditions
     dlcs = clause.get_descendant_literal_clauses()
-    for dlc in dlcs:
-        if retval.tell() > 1:
-            retval.write(", ")
-        retval.write("%s=%s" % (dlc.hyperparameter.name, dlc.value))
-    retval.write("}")
-    retval.seek(0)
-    return retval.getvalue()
+    return "{" + ", ".join("%s=%s" % (dlc.hyperparameter.name, dlc.value)
+                           for dlc in dlcs) + "}"
 
 
 def read(pcs_string, debug=False):
@@ -223,11 +218,17 @@ def read(pcs_string, debug=False):
 
         if "|" in line:
             # It's a condition
-            try:
-                c = pp_condition.parseString(line)
-                conditions.append(c)
-            except pyparsing.ParseException:
+            match = _COND_RE.match(line)
+            if match is None:
                 raise NotImplementedError("Could not parse condition: %s" % line)
+            child_name, parent_name, values = match.groups()
+            # Names are interned so that the dictionary lookups by name while
+            # building the conditions can short-circuit on identity
+            conditions.append((
+                sys.intern(child_name),
+                sys.intern(parent_name),
+                [value.strip() for value in values.split(",")],
+            ))
             continue
         if "}" not in line and "]" not in line:
             continue
@@ -238,42 +239,37 @@ def read(pcs_string, debug=False):
             continue
 
         ct += 1
-        param = None
-
-        create = {"int": UniformIntegerHyperparameter,
-                  "float": UniformFloatHyperparameter,
-                  "categorical": CategoricalHyperparameter}
 
+        # Only categorical parameters contain curly braces, so a single
+        # grammar has to be tried per line
         try:
-            param_list = pp_cont_param.parseString(line)
-            il = param_list[9:]
-            if len(il) > 0:
-                il = il[0]
-            param_list = param_list[:9]
-            name = param_list[0]
-            lower = float(param_list[2])
-            upper = float(param_list[4])
-            paramtype = "int" if "i" in il else "float"
-            log = True if "l" in il else False
-            default_value = float(param_list[7])
-            param = create[paramtype](name=name, lower=lower, upper=upper,
-                                      q=None, log=log, default_value=default_value)
-            cont_ct += 1
-        except pyparsing.ParseException:
-            pass
-
-        try:
-            param_list = pp_cat_param.parseString(line)
-            name = param_list[0]
-            choices = [c for c in param_list[2:-4:2]]
-            default_value = param_list[-2]
-            param = create["categorical"](name=name, choices=choices,
-                                          default_value=default_value)
-            cat_ct += 1
+            if "{" in line:
+                param_list = pp_cat_param.parseString(line)
+                name = sys.intern(param_list[0])
+                choices = list(param_list[2:-4])
+                default_value = param_list[-2]
+                param = CategoricalHyperparameter(name=name, choices=choices,
+                                                  default_value=default_value)
+                cat_ct += 1
+            else:
+                param_list = pp_cont_param.parseString(line)
+                il = param_list[9:]
+                if len(il) > 0:
+                    il = il[0]
+                param_list = param_list[:9]
+                name = sys.intern(param_list[0])
+                lower = float(param_list[2])
+                upper = float(param_list[4])
+                if "i" in il:
+                    hp_class = UniformIntegerHyperparameter
+                else:
+                    hp_class = UniformFloatHyperparameter
+                log = True if "l" in il else False
+                default_value = float(param_list[7])
+                param = hp_class(name=name, lower=lower, upper=upper,
+                                 q=None, log=log, default_value=default_value)
+                cont_ct += 1
         except pyparsing.ParseException:
-            pass
-
-        if param is None:
             raise NotImplementedError("Could not parse: %s" % line)
 
         configuration_space.add_hyperparameter(param)
@@ -305,20 +301,17 @@ def read(pcs_string, debug=False):
     # Now handle conditions
     # If there are two conditions for one child, these two conditions are an
     # AND-conjunction of conditions, thus we have to connect them
-    conditions_per_child = OrderedDict()
+    conditions_per_child = {}
     for condition in conditions:
-        child_name = condition[0]
-        if child_name not in conditions_per_child:
-            conditions_per_child[child_name] = list()
-        conditions_per_child[child_name].append(condition)
+        conditions_per_child.setdefault(condition[0], []).append(condition)
 
-    for child_name in conditions_per_child:
+    for child_name, child_conditions in conditions_per_child.items():
         condition_objects = []
-        for condition in conditions_per_child[child_name]:
-            child = configuration_space.get_hyperparameter(child_name)
-            parent_name = condition[2]
+        child = configuration_space.get_hyperparameter(child_name)
+        for condition in child_conditions:
+            parent_name = condition[1]
             parent = configuration_space.get_hyperparameter(parent_name)
-            restrictions = condition[5:-1:2]
+            restrictions = condition[2]
 
             # TODO: cast the type of the restriction!
             if len(restrictions) == 1:
@@ -370,39 +363,44 @@ def write(configuration_space):
         raise TypeError("pcs_parser.write expects an instance of %s, "
                         "you provided '%s'" % (ConfigurationSpace, type(configuration_space)))
 
-    param_lines = StringIO()
-    condition_lines = StringIO()
+    param_lines = []
+    condition_lines = []
     forbidden_lines = []
     for hyperparameter in configuration_space.get_hyperparameters():
         # Check if the hyperparameter names are valid SMAC names!
-        try:
-            pp_param_name.parseString(hyperparameter.name)
-        except pyparsing.ParseException:
+        if _NAME_RE.fullmatch(hyperparameter.name) is None:
             raise ValueError(
                 "Illegal hyperparameter name for SMAC: %s" % hyperparameter.name)
 
         # First build params
-        if param_lines.tell() > 0:
-            param_lines.write("\n")
         if isinstance(hyperparameter, NumericalHyperparameter):
-            param_lines.write(build_continuous(hyperparameter))
+            param_lines.append(build_continuous(hyperparameter))
         elif isinstance(hyperparameter, CategoricalHyperparameter):
-            param_lines.write(build_categorical(hyperparameter))
+            param_lines.append(build_categorical(hyperparameter))
         elif isinstance(hyperparameter, Constant):
-            param_lines.write(build_constant(hyperparameter))
+            param_lines.append(build_constant(hyperparameter))
         else:
             raise TypeError("Unknown type: %s (%s)" % (
                 type(hyperparameter), hyperparameter))
 
     for condition in configuration_space.get_conditions():
-        if condition_lines.tell() > 0:
-            condition_lines.write("\n")
-        condition_lines.write(build_condition(condition))
+        condition_lines.append(build_condition(condition))
 
     for forbidden_clause in configuration_space.get_forbiddens():
-        # Convert in-statement into two or more equals statements
         dlcs = forbidden_clause.get_descendant_literal_clauses()
-        # First, get all in statements and convert them to equal statements
+        # Forbiddens without in statements are written as they are. Equals
+        # clauses are by far the most common ones and are recognized by their
+        # exact type before walking the class hierarchy
+        if not any(type(dlc) is not ForbiddenEqualsClause
+                   and isinstance(dlc, MultipleValueForbiddenClause) for dlc in dlcs):
+            forbidden_lines.append(build_forbidden(forbidden_clause))
+            continue
+
+        # Convert in-statement into two or more equals statements
+        # First, get all in statements and convert them to equal statements.
+        # The values of an in statement are legal values of its hyperparameter
+        # already, so the equal statements are formatted directly instead of
+        # instantiating a ForbiddenEqualsClause for every value
         in_statements = []
         other_statements = []
         for dlc in dlcs:
@@ -411,38 +409,32 @@ def write(configuration_space):
                     raise ValueError("SMAC cannot handle this forbidden "
                                      "clause: %s" % dlc)
                 in_statements.append(
-                    [ForbiddenEqualsClause(dlc.hyperparameter, value)
+                    ["%s=%s" % (dlc.hyperparameter.name, value)
                      for value in dlc.values])
             else:
-                other_statements.append(dlc)
+                other_statements.append("%s=%s" % (dlc.hyperparameter.name, dlc.value))
 
         # Second, create the product of all elements in the IN statements,
-        # create a ForbiddenAnd and add all ForbiddenEquals
-        if len(in_statements) > 0:
-            for i, p in enumerate(product(*in_statements)):
-                all_forbidden_clauses = list(p) + other_statements
-                f = ForbiddenAndConjunction(*all_forbidden_clauses)
-                forbidden_lines.append(build_forbidden(f))
-        else:
-            forbidden_lines.append(build_forbidden(forbidden_clause))
+        # which gives one AND-conjunction of equals statements per combination
+        for p in product(*in_statements):
+            forbidden_lines.append("{" + ", ".join(list(p) + other_statements) + "}")
 
-    if condition_lines.tell() > 0:
-        condition_lines.seek(0)
-        param_lines.write("\n\n")
-        for line in condition_lines:
-            param_lines.write(line)
+    # Blocks are separated by an empty line and the forbidden block is
+    # terminated by a newline
+    lines = param_lines
+    if len(condition_lines) > 0:
+        lines.append("")
+        lines.extend(condition_lines)
 
     if len(forbidden_lines) > 0:
         forbidden_lines.sort()
-        param_lines.write("\n\n")
-        for line in forbidden_lines:
-            param_lines.write(line)
-            param_lines.write("\n")
+        lines.append("")
+        lines.extend(forbidden_lines)
+        lines.append("")
 
     # Check if the default configuration is a valid configuration!
 
-    param_lines.seek(0)
-    return param_lines.getvalue()
+    return "\n".join(lines)
 
 
 if __name__ == "__main__":
@@ -23,9 +23,9 @@ and further examples are provided in the
 __authors__ = ["Katharina Eggensperger", "Matthias Feurer", "Christina Hernández Wunsch"]
 __contact__ = "automl.org"
 
-from collections import OrderedDict
 from itertools import product
-from io import StringIO
+import re
+import sys
 
 import pyparsing
 
@@ -107,28 +107,44 @@ pp_condition = pp_param_name + "|" + pp_param_name + pp_param_operation + \
 pp_forbidden_clause = "{" + pp_param_name + "=" + pp_numberorname + \
     pyparsing.Optional(pyparsing.OneOrMore("," + pp_param_name + "=" + pp_numberorname)) + "}"
 
+# Regular expressions for the parts of the pcs format that form a regular language. Like
+# pyparsing.Word, names and operations are matched greedily and never backtracked into,
+# so they yield the same tokens as the corresponding pyparsing expressions.
+_NAME_CHARS = r"A-Za-z0-9_\-@.:;\\/?!$%&*+<>"
+_NAME = r"[%s]+(?![%s])" % (_NAME_CHARS, _NAME_CHARS)
+_OPERATION = r"[in!=<>]+(?![in!=<>])"
+# Used to validate names in write()
+_NAME_RE = re.compile(_NAME)
+
+# Conditions, ``child | parent op value [&& or || parent op value ...]``, see pp_condition
+_COND_CHILD_RE = re.compile(r"(%s)\s*\|" % _NAME)
+_COND_CLAUSE_RE = re.compile(
+    r"\s*(\|\||&&)?\s*(%s)\s*(%s)\s*(\{)?\s*(%s(?:\s*,\s*%s)*)\s*(\})?"
+    % (_NAME, _OPERATION, _NAME, _NAME)
+)
+
+# Forbidden clauses, ``{name=value, name=value, ...}``, see pp_forbidden_clause
+_FORBIDDEN_RE = re.compile(
+    r"\{\s*%s\s*=\s*%s(?:\s*,\s*%s\s*=\s*%s)*\s*\}" % (_NAME, _NAME, _NAME, _NAME)
+)
+_FORBIDDEN_PAIR_RE = re.compile(r"(%s)\s*=\s*(%s)" % (_NAME, _NAME))
+
 
 def build_categorical(param):
     if param.weights is not None:
         raise ValueError('The pcs format does not support categorical hyperparameters with '
                          'assigned weights (for hyperparameter %s)' % param.name)
-    cat_template = "%s categorical {%s} [%s]"
-    return cat_template % (param.name,
-                           ", ".join([str(value) for value in param.choices]),
-                           str(param.default_value))
+    choices = ", ".join(map(str, param.choices))
+    return f"{param.name} categorical {{{choices}}} [{param.default_value}]"
 
 
 def build_ordinal(param):
-    ordinal_template = '%s ordinal {%s} [%s]'
-    return ordinal_template % (param.name,
-                               ", ".join([str(value) for value in param.sequence]),
-                               str(param.default_value))
+    sequence = ", ".join(map(str, param.sequence))
+    return f"{param.name} ordinal {{{sequence}}} [{param.default_value}]"
 
 
 def build_constant(param):
-    const_template = '%s categorical {%s} [%s]'
-    return const_template % (param.name,
-                             param.value, param.value)
+    return f"{param.name} categorical {{{param.value}}} [{param.value}]"
 
 
 def build_continuous(param):
@@ -136,25 +152,19 @@ def build_continuous(param):
                        NormalFloatHyperparameter):
         param = param.to_uniform()
 
-    float_template = "%s%s real [%s, %s] [%s]"
-    int_template = "%s%s integer [%d, %d] [%d]"
-    if param.log:
-        float_template += "log"
-        int_template += "log"
+    log_suffix = "log" if param.log else ""
 
     if param.q is not None:
-        q_prefix = "Q%d_" % (int(param.q),)
+        q_prefix = f"Q{int(param.q)}_"
     else:
         q_prefix = ""
-    default_value = param.default_value
 
     if isinstance(param, IntegerHyperparameter):
-        default_value = int(default_value)
-        return int_template % (q_prefix, param.name, param.lower,
-                               param.upper, default_value)
+        return (f"{q_prefix}{param.name} integer [{param.lower:d}, {param.upper:d}] "
+                f"[{int(param.default_value):d}]{log_suffix}")
     else:
-        return float_template % (q_prefix, param.name, str(param.lower),
-                                 str(param.upper), str(default_value))
+        return (f"{q_prefix}{param.name} real [{param.lower}, {param.upper}] "
+                f"[{param.default_value}]{log_suffix}")
 
 
 def build_condition(condition):
@@ -207,7 +217,7 @@ def build_conjunction(conjunction):
         tmp = build_condition(component.get_descendant_literal_conditions()[0])
 
         # This is somehow hacky, but should work for now
-        tmp = tmp.split("|")[1].strip()
+        tmp = tmp.partition("|")[2].strip()
 
         cond_list.append(tmp)
     if isinstance(conjunction, AndConjunction):
@@ -227,67 +237,85 @@ def build_forbidden(clause):
                         "'%s', got '%s'" %
                         (ForbiddenRelation, type(clause)))
 
-    retval = StringIO()
-    retval.write("{")
     # Really simple because everything is an AND-conjunction of equals
     # conditions
     dlcs = clause.get_descendant_literal_clauses()
-    for dlc in dlcs:
-        if retval.tell() > 1:
-            retval.write(", ")
-        retval.write("%s=%s" % (dlc.hyperparameter.name, dlc.value))
-    retval.write("}")
-    retval.seek(0)
-    return retval.getvalue()
+    return "{" + ", ".join("%s=%s" % (dlc.hyperparameter.name, dlc.value)
+                           for dlc in dlcs) + "}"
+
+
+def _parse_condition(line):
+    # Returns the same tokens as pp_condition.parseString(line) or None if the
+    # line is not a condition
+    match = _COND_CHILD_RE.match(line)
+    if match is None:
+        return None
+    tokens = [match.group(1), "|"]
+    pos = match.end()
+    while True:
+        match = _COND_CLAUSE_RE.match(line, pos)
+        if match is None:
+            break
+        connective, parent, operation, opening, values, closing = match.groups()
+        # Only the first clause comes without a connective
+        is_first_clause = len(tokens) == 2
+        if (connective is None) != is_first_clause:
+            break
+        if connective is not None:
+            tokens.append(connective)
+        tokens.extend((parent, operation))
+        if opening is not None:
+            tokens.append(opening)
+        for value in values.split(","):
+            tokens.extend((value.strip(), ","))
+        tokens.pop()
+        if closing is not None:
+            tokens.append(closing)
+        pos = match.end()
+    if len(tokens) == 2:
+        return None
+    return tokens
+
+
+# Condition classes per operation, a single value of an in statement is read as an equals
+# condition
+_CONDITION_CLASSES = {
+    'in': EqualsCondition,
+    '==': EqualsCondition,
+    '!=': NotEqualsCondition,
+    '<': LessThanCondition,
+    '>': GreaterThanCondition,
+}
 
 
 def condition_specification(child_name, condition, configuration_space):
     # specifies the condition type
     child = configuration_space.get_hyperparameter(child_name)
-    parent_name = condition[0]
+    parent_name = sys.intern(condition[0])
     parent = configuration_space.get_hyperparameter(parent_name)
     operation = condition[1]
+    if operation not in _CONDITION_CLASSES:
+        raise ValueError('Unknown operation in condition: %s' % ' '.join(condition))
+
     if operation == 'in':
+        if condition[2] != '{' or condition[-1] != '}':
+            raise ValueError('in-conditions need braced values: %s' % ' '.join(condition))
         restrictions = condition[3:-1:2]
-        for i in range(len(restrictions)):
-            if isinstance(parent, FloatHyperparameter):
-                restrictions[i] = float(restrictions[i])
-            elif isinstance(parent, IntegerHyperparameter):
-                restrictions[i] = int(restrictions[i])
-
-        if len(restrictions) == 1:
-            condition = EqualsCondition(child, parent, restrictions[0])
-        else:
-            condition = InCondition(child, parent, values=restrictions)
-        return condition
     else:
-        restrictions = condition[2]
-        if isinstance(parent, FloatHyperparameter):
-            restrictions = float(restrictions)
-        elif isinstance(parent, IntegerHyperparameter):
-            restrictions = int(restrictions)
-
-        if operation == '==':
-            condition = EqualsCondition(child, parent, restrictions)
-        elif operation == '!=':
-            condition = NotEqualsCondition(child, parent, restrictions)
-        else:
-            if isinstance(parent, FloatHyperparameter):
-                restrictions = float(restrictions)
-            elif isinstance(parent, IntegerHyperparameter):
-                restrictions = int(restrictions)
-            elif isinstance(parent, OrdinalHyperparameter):
-                pass
-            else:
-                raise ValueError('The parent of a conditional hyperparameter '
-                                 'must be either a float, int or ordinal '
-                                 'hyperparameter, but is %s.' % type(parent))
+        restrictions = [condition[2]]
+
+    if isinstance(parent, FloatHyperparameter):
+        restrictions = [float(restriction) for restriction in restrictions]
+    elif isinstance(parent, IntegerHyperparameter):
+        restrictions = [int(restriction) for restriction in restrictions]
+    elif operation in ('<', '>') and not isinstance(parent, OrdinalHyperparameter):
+        raise ValueError('The parent of a conditional hyperparameter '
+                         'must be either a float, int or ordinal '
+                         'hyperparameter, but is %s.' % type(parent))
 
-            if operation == '<':
-                condition = LessThanCondition(child, parent, restrictions)
-            elif operation == '>':
-                condition = GreaterThanCondition(child, parent, restrictions)
-        return condition
+    if len(restrictions) > 1:
+        return InCondition(child, parent, values=restrictions)
+    return _CONDITION_CLASSES[operation](child, parent, restrictions[0])
 
 
 def read(pcs_string, debug=False):
@@ -328,6 +356,7 @@ def read(pcs_string, debug=False):
 
     """
     configuration_space = ConfigurationSpace()
+    hyperparameters = []
     conditions = []
     forbidden = []
 
@@ -351,11 +380,10 @@ def read(pcs_string, debug=False):
         line = line.strip()
         if "|" in line:
             # It's a condition
-            try:
-                c = pp_condition.parseString(line)
-                conditions.append(c)
-            except pyparsing.ParseException:
+            c = _parse_condition(line)
+            if c is None:
                 raise NotImplementedError("Could not parse condition: %s" % line)
+            conditions.append(c)
             continue
         if "}" not in line and "]" not in line:
             continue
@@ -368,45 +396,34 @@ def read(pcs_string, debug=False):
         ct += 1
         param = None
 
-        create = {"int": UniformIntegerHyperparameter,
-                  "float": UniformFloatHyperparameter,
-                  "categorical": CategoricalHyperparameter,
-                  "ordinal": OrdinalHyperparameter
-                  }
-
+        # Only categorical and ordinal parameters contain curly braces, so a
+        # single grammar has to be tried per line
         try:
-            param_list = pp_cont_param.parseString(line)
-            name = param_list[0]
-            if param_list[1] == 'integer':
-                paramtype = 'int'
-            elif param_list[1] == 'real':
-                paramtype = 'float'
-            else:
-                paramtype = None
-
-            if paramtype in ['int', 'float']:
-                log = param_list[10:]
-                param_list = param_list[:10]
-                if len(log) > 0:
-                    log = log[0]
-                lower = float(param_list[3])
-                upper = float(param_list[5])
-                log_on = True if "log" in log else False
-                default_value = float(param_list[8])
-                param = create[paramtype](name=name, lower=lower, upper=upper,
-                                          q=None, log=log_on, default_value=default_value)
-                cont_ct += 1
-
-        except pyparsing.ParseException:
-            pass
-
-        try:
-            if "categorical" in line:
+            if "{" not in line:
+                param_list = pp_cont_param.parseString(line)
+                name = sys.intern(param_list[0])
+                if param_list[1] == 'integer':
+                    hp_class = UniformIntegerHyperparameter
+                elif param_list[1] == 'real':
+                    hp_class = UniformFloatHyperparameter
+                else:
+                    hp_class = None
+
+                if hp_class is not None:
+                    lower = float(param_list[3])
+                    upper = float(param_list[5])
+                    # The optional log flag is the only token after the default value
+                    log_on = param_list[-1] == "log"
+                    default_value = float(param_list[8])
+                    param = hp_class(name=name, lower=lower, upper=upper,
+                                     q=None, log=log_on, default_value=default_value)
+                    cont_ct += 1
+            elif "categorical" in line:
                 param_list = pp_cat_param.parseString(line)
-                name = param_list[0]
+                name = sys.intern(param_list[0])
                 choices = [choice for choice in param_list[3:-4:2]]
                 default_value = param_list[-2]
-                param = create["categorical"](
+                param = CategoricalHyperparameter(
                     name=name,
                     choices=choices,
                     default_value=default_value,
@@ -415,10 +432,10 @@ def read(pcs_string, debug=False):
 
             elif "ordinal" in line:
                 param_list = pp_ord_param.parseString(line)
-                name = param_list[0]
+                name = sys.intern(param_list[0])
                 sequence = [seq for seq in param_list[3:-4:2]]
                 default_value = param_list[-2]
-                param = create["ordinal"](
+                param = OrdinalHyperparameter(
                     name=name,
                     sequence=sequence,
                     default_value=default_value,
@@ -431,134 +448,66 @@ def read(pcs_string, debug=False):
         if param is None:
             raise NotImplementedError("Could not parse: %s" % line)
 
-        configuration_space.add_hyperparameter(param)
+        hyperparameters.append(param)
+
+    # Adding all hyperparameters at once updates the caches and checks the
+    # default configuration only once
+    configuration_space.add_hyperparameters(hyperparameters)
 
     for clause in forbidden:
-        param_list = pp_forbidden_clause.parseString(clause)
-        tmp_list = []
+        match = _FORBIDDEN_RE.match(clause)
+        if match is None:
+            raise NotImplementedError("Could not parse forbidden clause: %s" % clause)
         clause_list = []
-        for value in param_list[1:]:
-            if len(tmp_list) < 3:
-                tmp_list.append(value)
-            else:
-                # So far, only equals is supported by SMAC
-                if tmp_list[1] == '=':
-                    hp = configuration_space.get_hyperparameter(tmp_list[0])
-                    if isinstance(hp, NumericalHyperparameter):
-                        if isinstance(hp, IntegerHyperparameter):
-                            forbidden_value = int(tmp_list[2])
-                        elif isinstance(hp, FloatHyperparameter):
-                            forbidden_value = float(tmp_list[2])
-                        else:
-                            raise NotImplementedError
-                        if forbidden_value < hp.lower or forbidden_value > hp.upper:
-                            raise ValueError(f'forbidden_value is set out of the bound, it needs to'
-                                             f' be set between [{hp.lower}, {hp.upper}]'
-                                             f' but its value is {forbidden_value}')
-                    elif isinstance(hp, (CategoricalHyperparameter, OrdinalHyperparameter)):
-                        hp_values = hp.choices if isinstance(hp, CategoricalHyperparameter)\
-                            else hp.sequence
-                        forbidden_value_in_hp_values = tmp_list[2] in hp_values
-                        if forbidden_value_in_hp_values:
-                            forbidden_value = tmp_list[2]
-                        else:
-                            raise ValueError(f'forbidden_value is set out of the allowed value '
-                                             f'sets, it needs to be one member from {hp_values} '
-                                             f'but its value is {forbidden_value}')
-                    else:
-                        raise ValueError('Unsupported Hyperparamter sorts')
-
-                    clause_list.append(ForbiddenEqualsClause(
-                        configuration_space.get_hyperparameter(tmp_list[0]),
-                        forbidden_value))
+        # So far, only equals is supported by SMAC
+        for name, value in _FORBIDDEN_PAIR_RE.findall(clause, 0, match.end()):
+            hp = configuration_space.get_hyperparameter(name)
+            if isinstance(hp, NumericalHyperparameter):
+                if isinstance(hp, IntegerHyperparameter):
+                    forbidden_value = int(value)
+                elif isinstance(hp, FloatHyperparameter):
+                    forbidden_value = float(value)
+                else:
+                    raise NotImplementedError
+                if forbidden_value < hp.lower or forbidden_value > hp.upper:
+                    raise ValueError(f'forbidden_value is set out of the bound, it needs to'
+                                     f' be set between [{hp.lower}, {hp.upper}]'
+                                     f' but its value is {forbidden_value}')
+            elif isinstance(hp, (CategoricalHyperparameter, OrdinalHyperparameter)):
+                hp_values = hp.choices if isinstance(hp, CategoricalHyperparameter)\
+                    else hp.sequence
+                if value in hp_values:
+                    forbidden_value = value
                 else:
-                    raise NotImplementedError()
-                tmp_list = []
+                    raise ValueError(f'forbidden_value is set out of the allowed value '
+                                     f'sets, it needs to be one member from {hp_values} '
+                                     f'but its value is {value}')
+            else:
+                raise ValueError('Unsupported Hyperparamter sorts')
+
+            clause_list.append(ForbiddenEqualsClause(hp, forbidden_value))
         configuration_space.add_forbidden_clause(ForbiddenAndConjunction(
             *clause_list))
 
-    conditions_per_child = OrderedDict()
+    conditions_per_child = {}
     for condition in conditions:
-        child_name = condition[0]
-        if child_name not in conditions_per_child:
-            conditions_per_child[child_name] = list()
-        conditions_per_child[child_name].append(condition)
-
-    for child_name in conditions_per_child:
-        for condition in conditions_per_child[child_name]:
-            condition = condition[2:]
-            condition = ' '.join(condition)
-            if '||' in str(condition):
-                ors = []
-                # 1st case we have a mixture of || and &&
-                if '&&' in str(condition):
-                    ors_combis = []
-                    for cond_parts in str(condition).split('||'):
-                        condition = str(cond_parts).split('&&')
-                        # if length is 1 it must be or
-                        if len(condition) == 1:
-                            element_list = condition[0].split()
-                            ors_combis.append(
-                                condition_specification(
-                                    child_name,
-                                    element_list,
-                                    configuration_space,
-                                )
-                            )
-                        else:
-                            # now taking care of ands
-                            ands = []
-                            for and_part in condition:
-                                element_list = [
-                                    element for part in condition for element in and_part.split()
-                                ]
-                                ands.append(
-                                    condition_specification(
-                                        child_name,
-                                        element_list,
-                                        configuration_space,
-                                    )
-                                )
-                            ors_combis.append(AndConjunction(*ands))
-                    mixed_conjunction = OrConjunction(*ors_combis)
-                    configuration_space.add_condition(mixed_conjunction)
-                else:
-                    # 2nd case: we only have ors
-                    for cond_parts in str(condition).split('||'):
-                        element_list = [element for element in cond_parts.split()]
-                        ors.append(
-                            condition_specification(
-                                child_name,
-                                element_list,
-                                configuration_space,
-                            )
-                        )
-                    or_conjunction = OrConjunction(*ors)
-                    configuration_space.add_condition(or_conjunction)
-            else:
-                # 3rd case: we only have ands
-                if '&&' in str(condition):
-                    ands = []
-                    for cond_parts in str(condition).split('&&'):
-                        element_list = [element for element in cond_parts.split()]
-                        ands.append(
-                            condition_specification(
-                                child_name,
-                                element_list,
-                                configuration_space,
-                            )
-                        )
-                    and_conjunction = AndConjunction(*ands)
-                    configuration_space.add_condition(and_conjunction)
-                else:
-                    # 4th case: we have a normal condition
-                    element_list = [element for element in condition.split()]
-                    normal_condition = condition_specification(
-                        child_name,
-                        element_list,
-                        configuration_space,
-                    )
-                    configuration_space.add_condition(normal_condition)
+        # Names are interned so that the dictionary lookups by name while
+        # building the conditions can short-circuit on identity
+        child_name = sys.intern(condition[0])
+        conditions_per_child.setdefault(child_name, []).append(condition)
+
+    for child_name, child_conditions in conditions_per_child.items():
+        for condition in child_conditions:
+            condition = ' '.join(condition[2:])
+            # && binds stronger than ||, a single part is a normal condition
+            ors = []
+            for or_part in condition.split('||'):
+                ands = [
+                    condition_specification(child_name, and_part.split(), configuration_space)
+                    for and_part in or_part.split('&&')
+                ]
+                ors.append(ands[0] if len(ands) == 1 else AndConjunction(*ands))
+            configuration_space.add_condition(ors[0] if len(ors) == 1 else OrConjunction(*ors))
 
     return configuration_space
 
@@ -600,39 +549,33 @@ def write(configuration_space):
         raise TypeError("pcs_parser.write expects an instance of %s, "
                         "you provided '%s'" % (ConfigurationSpace, type(configuration_space)))
 
-    param_lines = StringIO()
-    condition_lines = StringIO()
+    param_lines = []
+    condition_lines = []
     forbidden_lines = []
     for hyperparameter in configuration_space.get_hyperparameters():
         # Check if the hyperparameter names are valid SMAC names!
-        try:
-            pp_param_name.parseString(hyperparameter.name)
-        except pyparsing.ParseException:
+        if _NAME_RE.fullmatch(hyperparameter.name) is None:
             raise ValueError(
                 "Illegal hyperparameter name for SMAC: %s" % hyperparameter.name)
 
         # First build params
-        if param_lines.tell() > 0:
-            param_lines.write("\n")
         if isinstance(hyperparameter, NumericalHyperparameter):
-            param_lines.write(build_continuous(hyperparameter))
+            param_lines.append(build_continuous(hyperparameter))
         elif isinstance(hyperparameter, CategoricalHyperparameter):
-            param_lines.write(build_categorical(hyperparameter))
+            param_lines.append(build_categorical(hyperparameter))
         elif isinstance(hyperparameter, OrdinalHyperparameter):
-            param_lines.write(build_ordinal(hyperparameter))
+            param_lines.append(build_ordinal(hyperparameter))
         elif isinstance(hyperparameter, Constant):
-            param_lines.write(build_constant(hyperparameter))
+            param_lines.append(build_constant(hyperparameter))
         else:
             raise TypeError("Unknown type: %s (%s)" % (
                 type(hyperparameter), hyperparameter))
 
     for condition in configuration_space.get_conditions():
-        if condition_lines.tell() > 0:
-            condition_lines.write("\n")
         if isinstance(condition, AndConjunction) or isinstance(condition, OrConjunction):
-            condition_lines.write(build_conjunction(condition))
+            condition_lines.append(build_conjunction(condition))
         else:
-            condition_lines.write(build_condition(condition))
+            condition_lines.append(build_condition(condition))
 
     for forbidden_clause in configuration_space.get_forbiddens():
         # Convert in-statement into two or more equals statements
@@ -646,35 +589,37 @@ def write(configuration_space):
                     raise ValueError("SMAC cannot handle this forbidden "
                                      "clause: %s" % dlc)
                 in_statements.append(
-                    [ForbiddenEqualsClause(dlc.hyperparameter, value)
+                    ["%s=%s" % (dlc.hyperparameter.name, value)
                      for value in dlc.values])
             else:
                 other_statements.append(dlc)
 
         # Second, create the product of all elements in the IN statements,
-        # create a ForbiddenAnd and add all ForbiddenEquals
+        # which gives one AND-conjunction of equals statements per combination.
+        # The values of an in statement are legal values of its hyperparameter
+        # already, so the lines are formatted directly instead of building a
+        # ForbiddenAndConjunction of ForbiddenEqualsClauses for each of them
         if len(in_statements) > 0:
-            for i, p in enumerate(product(*in_statements)):
-                all_forbidden_clauses = list(p) + other_statements
-                f = ForbiddenAndConjunction(*all_forbidden_clauses)
-                forbidden_lines.append(build_forbidden(f))
+            other_statements = ["%s=%s" % (dlc.hyperparameter.name, dlc.value)
+                                for dlc in other_statements]
+            for p in product(*in_statements):
+                forbidden_lines.append("{" + ", ".join(list(p) + other_statements) + "}")
         else:
             forbidden_lines.append(build_forbidden(forbidden_clause))
 
-    if condition_lines.tell() > 0:
-        condition_lines.seek(0)
-        param_lines.write("\n\n")
-        for line in condition_lines:
-            param_lines.write(line)
+    # Blocks are separated by an empty line and every forbidden clause is
+    # terminated by a newline
+    lines = param_lines
+    if len(condition_lines) > 0:
+        lines.append("")
+        lines.extend(condition_lines)
 
     if len(forbidden_lines) > 0:
         forbidden_lines.sort()
-        param_lines.write("\n\n")
-        for line in forbidden_lines:
-            param_lines.write(line)
-            param_lines.write("\n")
+        lines.append("")
+        lines.extend(forbidden_lines)
+        lines.append("")
 
     # Check if the default configuration is a valid configuration!
 
-    param_lines.seek(0)
-    return param_lines.getvalue()
+    return "\n".join(lines)
@@ -168,6 +168,12 @@ class TestPCSConverter(unittest.TestCase):
                                r"space.ConfigurationSpace'>, you provided "
                                r"'<(type|class) 'dict'>'", pcs.write, sp)
 
+    def test_write_illegal_name(self):
+        cs = ConfigurationSpace()
+        cs.add_hyperparameter(UniformIntegerHyperparameter("int a", -1, 6))
+        self.assertRaisesRegex(ValueError, "Illegal hyperparameter name for SMAC: int a",
+                               pcs.write, cs)
+
     def test_write_int(self):
         expected = "int_a [-1, 6] [2]i"
         cs = ConfigurationSpace()
@@ -220,6 +226,19 @@ class TestPCSConverter(unittest.TestCase):
         value = pcs.write(cs)
         self.assertIn(expected, value)
 
+    def test_build_forbidden_unsupported_clause(self):
+        a = CategoricalHyperparameter("a", ["a", "b", "c"], "a")
+        self.assertRaisesRegex(NotImplementedError, "SMAC cannot handle",
+                               pcs.build_forbidden, ForbiddenInClause(a, ["a", "b"]))
+
+    def test_write_forbidden_relation(self):
+        cs = ConfigurationSpace()
+        int_hp = UniformIntegerHyperparameter('int_hp', 0, 50, 30)
+        float_hp = UniformFloatHyperparameter('float_hp', 0., 50., 30.)
+        cs.add_hyperparameters([int_hp, float_hp])
+        cs.add_forbidden_clause(ForbiddenGreaterThanRelation(int_hp, float_hp))
+        self.assertRaisesRegex(NotImplementedError, "SMAC cannot handle", pcs.write, cs)
+
     """
     Tests for the "newer pcs" version in order to check
     if both deliver the same results
@@ -293,6 +312,12 @@ class TestPCSConverter(unittest.TestCase):
                                r"space.ConfigurationSpace'>, you provided "
                                r"'<(type|class) 'dict'>'", pcs_new.write, sp)
 
+    def test_write_new_illegal_name(self):
+        cs = ConfigurationSpace()
+        cs.add_hyperparameter(UniformIntegerHyperparameter("int a", -1, 6))
+        self.assertRaisesRegex(ValueError, "Illegal hyperparameter name for SMAC: int a",
+                               pcs_new.write, cs)
+
     def test_write_new_int(self):
         expected = "int_a integer [-1, 6] [2]"
         cs = ConfigurationSpace()
@@ -437,6 +462,16 @@ class TestPCSConverter(unittest.TestCase):
 
         self.assertEqual(cs_new, cs_with_forbidden)
 
+    def test_read_new_configuration_space_illegal_forbidden(self):
+        complex_cs = list()
+        complex_cs.append("cat_hp_str categorical {a, b, c} [b]")
+        complex_cs.append("{cat_hp_str=a,}")
+        self.assertRaisesRegex(NotImplementedError, "Could not parse forbidden clause",
+                               pcs_new.read, complex_cs)
+
+        complex_cs[1] = "{cat_hp_str=d}"
+        self.assertRaisesRegex(ValueError, "but its value is d", pcs_new.read, complex_cs)
+
     def test_write_new_configuration_space_forbidden_relation(self):
         cs_with_forbidden = ConfigurationSpace()
         int_hp = UniformIntegerHyperparameter('int_hp', 0, 50, 30)
@@ -545,6 +580,28 @@ class TestPCSConverter(unittest.TestCase):
         out = pcs_new.write(a)
         self.assertEqual(out, s)
 
+    def test_read_mixed_conjunction_with_in_condition(self):
+        s = "c integer [0, 2] [0]\n" + \
+            "d ordinal {cold, luke-warm, hot} [cold]\n" + \
+            "e real [0.0, 1.0] [0.0]\n" + \
+            "a real [0.0, 1.0] [0.0]\n" + \
+            "\n" + \
+            "a | d in {luke-warm, hot} && c > 1 || e > 0.5"
+
+        cs = pcs_new.read(s.split('\n'))
+        self.assertEqual(
+            "[((a | d in {'luke-warm', 'hot'} && a | c > 1) || a | e > 0.5)]",
+            str(cs.get_conditions()))
+
+    def test_read_in_condition_without_braces(self):
+        s = "d ordinal {cold, luke-warm, hot} [cold]\n" + \
+            "a real [0.0, 1.0] [0.0]\n" + \
+            "\n" + \
+            "a | d in hot"
+
+        self.assertRaisesRegex(ValueError, "in-conditions need braced values: d in hot",
+                               pcs_new.read, s.split('\n'))
+
     def test_read_write(self):
         # Some smoke tests whether reading, writing, reading alters makes the
         #  configspace incomparable